@@ -1,11 +1,17 @@
 import pandas as pd
 import yfinance as yf
-import plotly.graph_objects as go
-from datetime import date, timedelta
-from flask import Flask, render_template_string, request
+import plotly.io as pio
+from datetime import date, datetime, timedelta, timezone
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import NamedTuple
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, jsonify, render_template, request
+from urllib.parse import urlencode
 import numpy as np
-import json
-from plotly.utils import PlotlyJSONEncoder
+import orjson
 
 # --- Konfigurasi Ticker Awal ---
 # Daftar Tickers yang lebih luas (Simulasi IDX Active Stocks)
@@ -18,203 +24,490 @@ DEFAULT_IDX_TICKERS = [
 ]
 IHSG_TICKER = "^JKSE"
 
+# Jumlah maksimum saham yang ditampilkan (diurutkan berdasarkan Gain 30D); dapat diubah via form
+DEFAULT_TOP_K = 25
+
+# --- Nilai Default Form (dihitung sekali saat import) ---
+# Default parameters for a strong gap-up filter
+DEFAULT_CRITERIA = {
+    'open_ratio': 1.015,          # Open > 1.015 * Prev Close
+    'min_price': 50,              # Price > 50
+    'min_volume_shares': 5000000, # Volume > 5,000,000 shares
+    'top_k': DEFAULT_TOP_K,       # Tampilkan 25 saham teratas
+}
+
+# Parameters for Chart Indicators (default)
+DEFAULT_INDICATORS = {
+    'sma_short': 20, 'sma_long': 60, 'rsi_period': 14, 'vol_period': 20, 'hist_days': 30
+}
+
+# Label input indikator di form: (label, nama field)
+INDICATOR_INPUT_FIELDS = [
+    ("SMA Pendek (Hari)", "sma_short"),
+    ("SMA Panjang (Hari)", "sma_long"),
+    ("RSI Periode", "rsi_period"),
+]
+DEFAULT_INDICATOR_INPUTS = [(label, name, DEFAULT_INDICATORS[name]) for label, name in INDICATOR_INPUT_FIELDS]
+
+# Concatenate default list to string for textarea
+DEFAULT_TICKERS_STR = ", ".join(DEFAULT_IDX_TICKERS)
+
+# --- Cache Data Historis ---
+# Cache in-process agar screening berulang dalam rentang TTL tidak perlu download ulang dari Yahoo.
+# Format: {(frozenset(tickers), period): (timestamp, ohlcv)}
+DATA_CACHE_TTL = 300  # detik
+_DATA_CACHE = {}
+_DATA_CACHE_LOCK = threading.Lock()
+
+# IHSG sama untuk semua screening dan hanya berubah selama jam bursa, sehingga di-cache terpisah
+# dengan TTL lebih panjang. Format: {period: (expires_at, ihsg_data)}
+IHSG_CACHE_TTL_MARKET = 600       # 10 menit saat jam bursa
+IHSG_CACHE_TTL_CLOSED = 6 * 3600  # 6 jam di luar jam bursa
+IDX_TIMEZONE = timezone(timedelta(hours=7))  # WIB
+IDX_OPEN_HOUR, IDX_CLOSE_HOUR = 9, 16
+_IHSG_CACHE = {}
+_IHSG_CACHE_LOCK = threading.Lock()
+
+# Batas jumlah simbol per request ke Yahoo; universe yang lebih besar dipecah dan diunduh paralel
+DOWNLOAD_CHUNK_SIZE = 20
+DOWNLOAD_MAX_WORKERS = 8
+
+def _download_chunked(download_tickers, period):
+    """Mengunduh ticker dalam batch paralel, lalu menggabungkan hasilnya menjadi satu DataFrame MultiIndex."""
+    def fetch(chunk):
+        data = yf.download(chunk, period=period, threads=min(len(chunk), 16), progress=False)
+        # yfinance meratakan kolom jika hanya satu ticker; normalisasi selalu ke MultiIndex (Price, Ticker)
+        if data.columns.nlevels == 1 and not data.empty:
+            data.columns = pd.MultiIndex.from_product([data.columns, [chunk[0]]], names=['Price', 'Ticker'])
+        return data
+
+    if len(download_tickers) <= DOWNLOAD_CHUNK_SIZE:
+        return fetch(download_tickers)
+
+    chunks = [download_tickers[i:i + DOWNLOAD_CHUNK_SIZE] for i in range(0, len(download_tickers), DOWNLOAD_CHUNK_SIZE)]
+    with ThreadPoolExecutor(max_workers=min(len(chunks), DOWNLOAD_MAX_WORKERS)) as executor:
+        frames = list(executor.map(fetch, chunks))
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, axis=1)
+
 # --- Fungsi Pengambilan Data ---
-def load_historical_data(tickers, period="6mo"):
-    """Mengambil data historis dari yfinance."""
-    print(f"Loading data for {tickers}...")
+def _ihsg_cache_ttl():
+    """TTL cache IHSG: pendek saat jam bursa; di luar jam bursa lebih panjang, tapi tidak melewati pembukaan berikutnya."""
+    now = datetime.now(IDX_TIMEZONE)
+    if now.weekday() < 5 and IDX_OPEN_HOUR <= now.hour < IDX_CLOSE_HOUR:
+        return IHSG_CACHE_TTL_MARKET
+
+    next_open = now.replace(hour=IDX_OPEN_HOUR, minute=0, second=0, microsecond=0)
+    if next_open <= now:
+        next_open += timedelta(days=1)
+    while next_open.weekday() >= 5:
+        next_open += timedelta(days=1)
+    return min(IHSG_CACHE_TTL_CLOSED, (next_open - now).total_seconds())
+
+def _load_ihsg(period="6mo"):
+    """Mengambil data IHSG (kolom OHLCV satu level) dengan cache TTL sendiri."""
+    with _IHSG_CACHE_LOCK:
+        cached = _IHSG_CACHE.get(period)
+    if cached is not None and time.monotonic() < cached[0]:
+        return cached[1]
+
     try:
-        # Menambahkan IHSG jika belum ada untuk analisis makro
-        download_tickers = list(set(tickers + [IHSG_TICKER]))
-        
-        data = yf.download(download_tickers, period=period)
-        
-        stock_data_cols = [t for t in tickers if t != IHSG_TICKER]
+        ihsg_data = yf.download(IHSG_TICKER, period=period, progress=False)
+        if isinstance(ihsg_data.columns, pd.MultiIndex):
+            ihsg_data = ihsg_data.droplevel(1, axis=1)
+        if ihsg_data.empty:
+            return None
+
+        with _IHSG_CACHE_LOCK:
+            _IHSG_CACHE[period] = (time.monotonic() + _ihsg_cache_ttl(), ihsg_data)
+        return ihsg_data
+    except Exception as e:
+        print(f"Error loading IHSG data: {e}")
+        return None
+
+def load_stock_data(tickers, period="6mo"):
+    """Mengambil OHLCV saham (tanpa IHSG) dari yfinance dengan cache TTL; None jika data tidak tersedia."""
+    # IHSG tidak ikut di-screen; diambil terpisah lewat _load_ihsg
+    stock_tickers = [t for t in dict.fromkeys(tickers) if t != IHSG_TICKER]
+    cache_key = (frozenset(stock_tickers), period)
+    with _DATA_CACHE_LOCK:
+        cached = _DATA_CACHE.get(cache_key)
+    if cached is not None and time.monotonic() - cached[0] < DATA_CACHE_TTL:
+        return cached[1]
+
+    if not stock_tickers:
+        return None
+
+    print(f"Loading data for {stock_tickers}...")
+    try:
+        data = _download_chunked(stock_tickers, period)
         
-        # Penanganan MultiIndex vs SingleIndex data
-        if isinstance(data.columns, pd.MultiIndex):
-            stock_data = data.loc[:, (slice(None), stock_data_cols)]
-            ihsg_data = data.loc[:, (slice(None), IHSG_TICKER)].droplevel(1, axis=1) if IHSG_TICKER in data.columns.get_level_values(1) else None
-        else:
-            stock_data = data.copy()
-            ihsg_data = None 
-
-        return stock_data, ihsg_data
+        # Kolom selalu MultiIndex (Price, Ticker), lihat _download_chunked
+        if data.empty:
+            return None
+        ohlcv = OHLCV.from_frame(data)
+
+        # Hanya simpan hasil yang valid; error/data kosong akan dicoba ulang pada request berikutnya
+        now = time.monotonic()
+        with _DATA_CACHE_LOCK:
+            # Buang entri kedaluwarsa agar cache tidak tumbuh tanpa batas
+            for key in [k for k, (timestamp, _) in _DATA_CACHE.items() if now - timestamp >= DATA_CACHE_TTL]:
+                del _DATA_CACHE[key]
+            _DATA_CACHE[cache_key] = (now, ohlcv)
+
+        return ohlcv
     except Exception as e:
         print(f"Error loading data: {e}")
-        return pd.DataFrame(), pd.DataFrame()
+        return None
+
+def load_historical_data(tickers, period="6mo"):
+    """Tahap fetch: OHLCV saham + DataFrame IHSG; IHSG diambil paralel dengan download saham."""
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        ihsg_future = executor.submit(_load_ihsg, period)
+        ohlcv = load_stock_data(tickers, period=period)
+        return ohlcv, ihsg_future.result()
+
+def load_ticker_data(ticker, period="6mo"):
+    """Mengambil OHLCV satu ticker, memakai ulang hasil screening di cache jika masih berlaku."""
+    now = time.monotonic()
+    with _DATA_CACHE_LOCK:
+        for (_, cached_period), (timestamp, ohlcv) in _DATA_CACHE.items():
+            if cached_period == period and ticker in ohlcv.tickers and now - timestamp < DATA_CACHE_TTL:
+                return ohlcv.column(ticker)
+
+    # Chart tidak memakai IHSG, jadi cukup ambil data saham saja
+    ohlcv = load_stock_data([ticker], period=period)
+    if ohlcv is None:
+        raise ValueError(f"Data {ticker} tidak tersedia.")
+    return ohlcv.column(ticker)
+
+# --- Struktur Data OHLCV (Struct-of-Arrays) ---
+# eq=False: hash berdasarkan identitas objek, sehingga OHLCV dari cache data bisa menjadi key lru_cache
+@dataclass(eq=False)
+class OHLCV:
+    """Data harga semua ticker sebagai satu array NumPy 2D (hari x ticker) per field."""
+    index: pd.DatetimeIndex
+    tickers: list
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    @classmethod
+    def from_frame(cls, data):
+        """Konversi sekali dari DataFrame yfinance (MultiIndex Price x Ticker) ke array per field.
+
+        Setiap field diambil langsung dari level kolom pertama, tanpa menyalin/mengurutkan seluruh frame dulu.
+        """
+        tickers = data.columns.get_level_values(1).unique().tolist()
+
+        def field(name):
+            return data[name][tickers].to_numpy(dtype=float)
+
+        return cls(
+            index=data.index,
+            tickers=tickers,
+            open=field('Open'),
+            high=field('High'),
+            low=field('Low'),
+            close=field('Close'),
+            volume=field('Volume'),
+        )
+
+    def column(self, ticker):
+        """OHLCV satu ticker sebagai view kolom (hari x 1) tanpa menyalin data."""
+        i = self.tickers.index(ticker)
+        return OHLCV(
+            index=self.index,
+            tickers=[ticker],
+            open=self.open[:, i:i + 1],
+            high=self.high[:, i:i + 1],
+            low=self.low[:, i:i + 1],
+            close=self.close[:, i:i + 1],
+            volume=self.volume[:, i:i + 1],
+        )
 
 # --- Fungsi Perhitungan Indikator Teknis ---
-def calculate_indicators(df, sma_short, sma_long, rsi_period, vol_period, hist_days):
-    """Menghitung indikator teknis yang diminta."""
-    
-    # Indikator yang diperlukan untuk sorting (30 hari return)
-    df['Hist_Return_30D'] = (df['Close'] / df['Close'].shift(hist_days) - 1) * 100
-    df['Avg_Volume'] = df['Volume'].rolling(window=vol_period).mean()
-    
-    # Indikator lain (optional, tapi dihitung)
-    df['SMA_Short'] = df['Close'].rolling(window=sma_short).mean()
-    df['SMA_Long'] = df['Close'].rolling(window=sma_long).mean()
-    delta = df['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=rsi_period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=rsi_period).mean()
-    rs = gain / loss
-    df['RSI'] = 100 - (100 / (1 + rs))
+# Semua indikator dihitung pada array NumPy 2D (hari x ticker) tanpa overhead pandas per kolom.
+def _sma_cumsum(x, window):
+    """Rolling mean sepanjang hari (axis 0) dengan trik cumsum, O(hari) berapapun panjang window.
+
+    Baris awal yang belum lengkap diisi NaN, dan window yang memuat NaN menghasilkan NaN (seperti pandas).
+    """
+    out = np.full(x.shape, np.nan)
+    if 1 <= window <= x.shape[0]:
+        valid = ~np.isnan(x)
+        zeros = np.zeros((1,) + x.shape[1:])
+        csum = np.concatenate([zeros, np.cumsum(np.where(valid, x, 0.0), axis=0)])
+        count = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+        window_sum = csum[window:] - csum[:-window]
+        window_count = count[window:] - count[:-window]
+        out[window - 1:] = np.where(window_count == window, window_sum / window, np.nan)
+    return out
+
+def _shift(x, periods):
+    """Padanan DataFrame.shift(periods) untuk array 2D."""
+    out = np.full(x.shape, np.nan)
+    if periods < x.shape[0]:
+        out[periods:] = x[:x.shape[0] - periods]
+    return out
+
+def _rsi_wilder(close, period):
+    """RSI Wilder secara streaming: satu lintasan O(hari), diperbarui untuk semua ticker per langkah."""
+    avg_gain = np.full(close.shape, np.nan)
+    avg_loss = np.full(close.shape, np.nan)
+    if period >= 1 and close.shape[0] > period:
+        delta = np.diff(close, axis=0)
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+
+        # Inisialisasi dengan rata-rata sederhana `period` hari pertama, lalu smoothing Wilder
+        avg_gain[period] = gain[:period].mean(axis=0)
+        avg_loss[period] = loss[:period].mean(axis=0)
+        for t in range(period + 1, close.shape[0]):
+            avg_gain[t] = (avg_gain[t - 1] * (period - 1) + gain[t - 1]) / period
+            avg_loss[t] = (avg_loss[t - 1] * (period - 1) + loss[t - 1]) / period
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+def calculate_indicators(ohlcv, sma_short, sma_long, rsi_period, vol_period, hist_days):
+    """Menghitung indikator teknis untuk semua ticker sekaligus.
+
+    Hasilnya dict berisi array indikator 2D dengan bentuk yang sama seperti `ohlcv.close` (hari x ticker).
+    """
+    close, volume = ohlcv.close, ohlcv.volume
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hist_return = (close / _shift(close, hist_days) - 1) * 100
 
-    return df
+    return {
+        # Indikator yang diperlukan untuk sorting (30 hari return)
+        'Hist_Return_30D': hist_return,
+        'Avg_Volume': _sma_cumsum(volume, vol_period),
+        # Indikator lain (optional, tapi dihitung)
+        'SMA_Short': _sma_cumsum(close, sma_short),
+        'SMA_Long': _sma_cumsum(close, sma_long),
+        'RSI': _rsi_wilder(close, rsi_period),
+    }
+
+# --- Cache Indikator ---
+# Jika user hanya mengubah kriteria filter (open_ratio/min_price/min_volume_shares/top_k), matriks indikator
+# tidak perlu dihitung ulang; cukup mask boolean yang diterapkan kembali.
+# Format: {(frozenset(tickers), period, indicator_items): (timestamp, ohlcv, indicators)}
+INDICATOR_CACHE_TTL = 300  # detik
+_INDICATOR_CACHE = {}
+_INDICATOR_CACHE_LOCK = threading.Lock()
+
+def load_indicators(ohlcv, period, indicator_params):
+    """Mengambil matriks indikator dari cache, atau menghitungnya jika belum ada/kedaluwarsa."""
+    cache_key = (frozenset(ohlcv.tickers), period, tuple(sorted(indicator_params.items())))
+    now = time.monotonic()
+    with _INDICATOR_CACHE_LOCK:
+        cached = _INDICATOR_CACHE.get(cache_key)
+    # Entri hanya berlaku untuk objek OHLCV yang sama; download baru berarti data baru
+    if cached is not None and cached[1] is ohlcv and now - cached[0] < INDICATOR_CACHE_TTL:
+        return cached[2]
+
+    indicators = calculate_indicators(ohlcv, **indicator_params)
+    with _INDICATOR_CACHE_LOCK:
+        # Buang entri kedaluwarsa agar cache tidak tumbuh tanpa batas
+        for key in [k for k, (timestamp, _, _) in _INDICATOR_CACHE.items() if now - timestamp >= INDICATOR_CACHE_TTL]:
+            del _INDICATOR_CACHE[key]
+        _INDICATOR_CACHE[cache_key] = (now, ohlcv, indicators)
+    return indicators
 
 # --- Fungsi Screening dan Ekstraksi Data ---
-def screen_and_extract(full_data, ihsg_data, criteria_params, indicator_params):
-    """Menerapkan kriteria screening dan mengumpulkan hasil."""
-    
+def ihsg_summary(ihsg_data):
+    """Ringkasan status IHSG (harga terakhir & perubahan harian) untuk ditampilkan."""
+    if ihsg_data is None or ihsg_data.empty:
+        return "N/A", 0
+    ihsg_latest = ihsg_data['Close'].iloc[-1]
+    ihsg_prev_close = ihsg_data['Close'].iloc[-2] if len(ihsg_data) > 1 else ihsg_latest
+    ihsg_change = ((ihsg_latest / ihsg_prev_close) - 1) * 100
+    return f"{ihsg_latest:,.2f} ({ihsg_change:+.2f}%)", ihsg_change
+
+@lru_cache(maxsize=32)
+def screen(ohlcv, period, criteria_items, indicator_items):
+    """Tahap screen: menerapkan kriteria screening pada OHLCV dan mengumpulkan hasil.
+
+    Hasilnya hanya bergantung pada argumen (efek sampingnya cuma mengisi _INDICATOR_CACHE lewat
+    load_indicators), sehingga aman di-cache dengan lru_cache; parameter dict dikirim sebagai tuple item
+    (lihat `_as_key`). Hasil yang dikembalikan dipakai bersama antar request, jangan dimodifikasi.
+
+    Mengembalikan (results, passed_count): results sudah dibatasi Top-K, passed_count dihitung sebelum dibatasi.
+    """
+    criteria_params = dict(criteria_items)
+    indicator_params = dict(indicator_items)
     results = []
-    chart_jsons = {}
-    
-    # List kolom/ticker yang ada di MultiIndex (jika ada)
-    if isinstance(full_data.columns, pd.MultiIndex):
-        tickers_available = full_data.columns.get_level_values(1).unique().tolist()
-    elif not full_data.empty:
-        # Jika hanya satu ticker yang diunduh, kolomnya hanya 1 level
-        tickers_available = [full_data.columns[0]] if len(full_data.columns.names) == 1 and full_data.columns.names[0] == 'Ticker' else [IHSG_TICKER]
-    else:
-        return [], {}, 'N/A', 0
-    
-    # Analisis IHSG
-    ihsg_status = "N/A"
-    ihsg_change = 0
-    if ihsg_data is not None and not ihsg_data.empty:
-        ihsg_latest = ihsg_data['Close'].iloc[-1]
-        ihsg_prev_close = ihsg_data['Close'].iloc[-2] if len(ihsg_data) > 1 else ihsg_latest
-        ihsg_change = ((ihsg_latest / ihsg_prev_close) - 1) * 100
-        ihsg_status = f"{ihsg_latest:,.2f} ({ihsg_change:+.2f}%)"
-
-    tickers_to_process = [t for t in tickers_available if t != IHSG_TICKER]
-
-    for ticker in tickers_to_process:
-        try:
-            # Ekstrak data untuk ticker ini
-            if isinstance(full_data.columns, pd.MultiIndex):
-                stock_df = full_data.loc[:, (slice(None), ticker)].droplevel(1, axis=1).copy()
-            else:
-                 # Jika hanya satu ticker yang diunduh (meski di multi-download), yfinance kadang meratakan kolom
-                stock_df = full_data.copy()
-                if stock_df.columns.name == 'Ticker' and stock_df.columns[0] != ticker:
-                     continue # Lewati jika data ini bukan untuk ticker yang dimaksud
-
-            # 1. Hitung Indikator (terutama return 30D & Volume Average)
-            stock_df = calculate_indicators(stock_df, **indicator_params)
-            
-            # 2. Ambil data terbaru
-            latest = stock_df.iloc[-1]
-            yesterday = stock_df.iloc[-2] if len(stock_df) > 1 else latest
-
-            current_close = latest['Close']
-            yesterday_close = yesterday['Close']
-            current_open = latest['Open']
-            current_volume = latest['Volume']
-            # avg_volume = latest.get('Avg_Volume', 1) # Not strictly needed for hard filter
-            avg_volume = latest.get('Avg_Volume', 1) 
-            return_30d = latest.get('Hist_Return_30D', -999) # Default return rendah jika N/A
-
-            # --- Kriteria Screening ---
-            
-            # A. Open Price Ratio: open price > X * previous close (Customizable via criteria_params['open_ratio'])
-            open_ratio_ok = current_open > (criteria_params['open_ratio'] * yesterday_close)
-            
-            # B. Min Price: Price > X (Customizable via criteria_params['min_price'])
-            min_price_ok = current_close >= criteria_params['min_price']
 
-            # C. Min Volume (Shares): volume > X shares (Customizable via criteria_params['min_volume_shares'])
-            min_volume_ok = current_volume > criteria_params['min_volume_shares']
-            
-            # D. Min Relative Volume (Tambahan optional, bisa dicustom)
-            # relative_volume_ok = current_volume > (1.5 * avg_volume)
-            
-            # --- Cek Kelayakan ---
-            if open_ratio_ok and min_price_ok and min_volume_ok:
-                
-                # --- Ekstraksi Data untuk Hasil ---
-                result = {
-                    'Ticker': ticker,
-                    'Harga Terakhir': f"{current_close:,.2f}",
-                    'Gain 30D (%)': return_30d, # Ini akan digunakan untuk sorting
-                    'Open/Close Ratio': f"{(current_open / yesterday_close):.3f}x",
-                    'Open Hari Ini': f"{current_open:,.2f}",
-                    'Close Kemarin': f"{yesterday_close:,.2f}",
-                    'Volume Hari Ini': f"{current_volume:,.0f}",
-                    'Avg Volume 20D': f"{avg_volume:,.0f}",
-                    'RSI': f"{latest.get('RSI', np.nan):.2f}",
-                }
-                results.append(result)
-                
-                # Buat JSON Chart untuk ticker yang lolos
-                chart_jsons[ticker] = create_plotly_json(stock_df, ticker, indicator_params)
-
-        except Exception as e:
-            print(f"Skipping {ticker} due to detailed analysis error: {e}")
-            continue
+    # 1. Indikator untuk semua ticker sekaligus (array 2D hari x ticker), dari cache jika ada
+    indicators = load_indicators(ohlcv, period, indicator_params)
+
+    # 2. Ambil data terbaru (satu elemen per ticker)
+    last_close = ohlcv.close[-1]
+    prev_close = ohlcv.close[-2] if len(ohlcv.close) > 1 else last_close
+    last_open = ohlcv.open[-1]
+    last_volume = ohlcv.volume[-1]
+    avg_volume = indicators['Avg_Volume'][-1]
+    return_30d = indicators['Hist_Return_30D'][-1]
+    last_rsi = indicators['RSI'][-1]
+
+    # --- Kriteria Screening (mask boolean untuk semua ticker sekaligus) ---
+    # A. Open Price Ratio: open price > X * previous close (Customizable via criteria_params['open_ratio'])
+    # B. Min Price: Price >= X (Customizable via criteria_params['min_price'])
+    # C. Min Volume (Shares): volume > X shares (Customizable via criteria_params['min_volume_shares'])
+    # D. Min Relative Volume (Tambahan optional, bisa dicustom)
+    #    relative_volume_ok = last_volume > (1.5 * avg_volume)
+    mask = (
+        (last_open > criteria_params['open_ratio'] * prev_close)
+        & (last_close >= criteria_params['min_price'])
+        & (last_volume > criteria_params['min_volume_shares'])
+    )
 
-    return results, chart_jsons, ihsg_status, ihsg_change
+    # --- Sorting & Batasi Top-K ---
+    # Diurutkan berdasarkan Gain 30D (%) secara DESCENDING; ticker tanpa data return dibuang
+    survivors = np.flatnonzero(mask & ~np.isnan(return_30d))
+    order = survivors[np.argsort(-return_30d[survivors], kind='stable')][:criteria_params['top_k']]
+
+    # --- Ekstraksi Data hanya untuk ticker yang lolos ---
+    # Chart tidak dibuat di sini; browser mengambilnya per ticker via endpoint /chart/<ticker>
+    for i in order:
+        results.append({
+            'Ticker': ohlcv.tickers[i],
+            'Harga Terakhir': f"{last_close[i]:,.2f}",
+            'Gain 30D (%)': return_30d[i], # Ini akan digunakan untuk sorting
+            'Open/Close Ratio': f"{(last_open[i] / prev_close[i]):.3f}x",
+            'Open Hari Ini': f"{last_open[i]:,.2f}",
+            'Close Kemarin': f"{prev_close[i]:,.2f}",
+            'Volume Hari Ini': f"{last_volume[i]:,.0f}",
+            'Avg Volume 20D': f"{avg_volume[i]:,.0f}",
+            'RSI': f"{last_rsi[i]:.2f}",
+        })
+
+    # Jumlah yang lolos dihitung sebelum dibatasi Top-K, untuk ditampilkan di judul hasil
+    return results, len(survivors)
+
+def _as_key(params):
+    """Konversi dict parameter ke tuple yang bisa di-hash untuk key lru_cache."""
+    return tuple(sorted(params.items()))
 
 # --- Fungsi Plotting (Mengubah Plotly ke JSON) ---
-# Dibiarkan sama seperti versi sebelumnya
-def create_plotly_json(df, ticker, indicators):
-    """Membuat chart harga (OHLC) dan indikator teknis menggunakan Plotly, diubah ke JSON."""
-    
-    fig = go.Figure(data=[
-        go.Candlestick(
-            x=df.index,
-            open=df['Open'], high=df['High'], low=df['Low'], close=df['Close'],
-            name='Candlestick',
-            increasing_line_color='#10b981', 
-            decreasing_line_color='#ef4444' 
-        )
-    ])
-    
-    fig.add_trace(go.Scatter(x=df.index, y=df['SMA_Short'], line=dict(color='#3b82f6', width=1), name=f'SMA {indicators["sma_short"]}'))
-    fig.add_trace(go.Scatter(x=df.index, y=df['SMA_Long'], line=dict(color='#f97316', width=1), name=f'SMA {indicators["sma_long"]}'))
-
-    fig.update_layout(
-        title=f'Chart Harga & Indikator: {ticker}',
-        xaxis_rangeslider_visible=False,
-        height=400,
-        margin=dict(l=20, r=20, t=40, b=20),
-        template="plotly_dark",
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font=dict(color="#facc15")
-    )
+# Figure disusun langsung sebagai dict (tanpa go.Figure) untuk menghindari validasi properti plotly
+# yang lambat; Plotly.js di browser menerima struktur yang sama. Template di-resolve sekali saat import.
+PLOTLY_DARK_TEMPLATE = pio.templates['plotly_dark'].to_plotly_json()
+
+def _chart_layout(height, margin, title=None):
+    """Layout dasar bersama untuk semua chart (tema gelap, background transparan)."""
+    layout = {
+        'height': height,
+        'margin': margin,
+        'template': PLOTLY_DARK_TEMPLATE,
+        'paper_bgcolor': 'rgba(0,0,0,0)',
+        'plot_bgcolor': 'rgba(0,0,0,0)',
+        'font': {'color': '#facc15'},
+    }
+    if title:
+        layout['title'] = {'text': title}
+    return layout
+
+def _hline(y, color):
+    """Padanan fig.add_hline: garis horizontal putus-putus selebar area plot."""
+    return {
+        'type': 'line', 'xref': 'x domain', 'x0': 0, 'x1': 1, 'yref': 'y', 'y0': y, 'y1': y,
+        'line': {'dash': 'dash', 'color': color},
+    }
+
+# Batas jumlah bar per chart; periode yang lebih panjang diagregasi per beberapa hari
+MAX_CHART_POINTS = 300
+
+def _downsample(dates, ohlc, volume, lines, max_points=MAX_CHART_POINTS):
+    """Agregasi bar OHLC per `step` hari jika jumlahnya melebihi `max_points`.
+
+    Open diambil dari hari pertama bucket, High/Low dari max/min, Close dan seri garis dari hari terakhir,
+    Volume dijumlahkan. Jika data sudah cukup pendek, semua seri dikembalikan apa adanya.
+    """
+    n = len(dates)
+    if n <= max_points:
+        return dates, ohlc, volume, lines
+
+    step = -(-n // max_points)
+    starts = np.arange(0, n, step)
+    ends = np.minimum(starts + step - 1, n - 1)
+    open_, high, low, close = ohlc
+    ohlc = (open_[starts], np.fmax.reduceat(high, starts), np.fmin.reduceat(low, starts), close[ends])
+    return dates[starts], ohlc, np.add.reduceat(volume, starts), [line[ends] for line in lines]
+
+def _trim_leading_nan(dates, values):
+    """Buang prefix NaN dari seri rolling (SMA/RSI) agar tidak dikirim sebagai deretan null."""
+    valid = np.flatnonzero(~np.isnan(values))
+    start = valid[0] if len(valid) else len(values)
+    return dates[start:], values[start:]
+
+def _json_default(obj):
+    """Fallback orjson: view kolom NumPy (non-contiguous) disalin ke array contiguous agar tetap bisa diserialisasi."""
+    if isinstance(obj, np.ndarray):
+        return np.ascontiguousarray(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def _dumps(payload):
+    """Serialisasi JSON dengan orjson; array NumPy ditulis langsung dan NaN menjadi null."""
+    return orjson.dumps(payload, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC)
+
+def create_plotly_json(dates, ohlc, sma_s, sma_l, rsi, volume, ticker, indicators):
+    """Membuat chart harga (OHLC) dan indikator teknis untuk Plotly sebagai dict siap-JSON (lihat `_dumps`).
+
+    `ohlc` adalah tuple (open, high, low, close); semua seri berupa array NumPy 1D yang sejajar dengan `dates`.
+    """
+    dates, ohlc, volume, (sma_s, sma_l, rsi) = _downsample(dates, ohlc, volume, [sma_s, sma_l, rsi])
+    open_, high, low, close = ohlc
+    dates = np.array(dates.strftime('%Y-%m-%d'))
+    sma_s_x, sma_s = _trim_leading_nan(dates, sma_s)
+    sma_l_x, sma_l = _trim_leading_nan(dates, sma_l)
+    rsi_x, rsi = _trim_leading_nan(dates, rsi)
+
+    fig = {
+        'data': [
+            {
+                'type': 'candlestick', 'x': dates.tolist(),
+                'open': open_, 'high': high, 'low': low, 'close': close,
+                'name': 'Candlestick',
+                'increasing': {'line': {'color': '#10b981'}},
+                'decreasing': {'line': {'color': '#ef4444'}},
+            },
+            {'type': 'scatter', 'x': sma_s_x.tolist(), 'y': sma_s, 'line': {'color': '#3b82f6', 'width': 1}, 'name': f'SMA {indicators["sma_short"]}'},
+            {'type': 'scatter', 'x': sma_l_x.tolist(), 'y': sma_l, 'line': {'color': '#f97316', 'width': 1}, 'name': f'SMA {indicators["sma_long"]}'},
+        ],
+        'layout': {
+            **_chart_layout(400, {'l': 20, 'r': 20, 't': 40, 'b': 20}, title=f'Chart Harga & Indikator: {ticker}'),
+            'xaxis': {'rangeslider': {'visible': False}},
+        },
+    }
     
     # Chart Volume
-    fig_volume = go.Figure()
-    fig_volume.add_trace(go.Bar(x=df.index, y=df['Volume'], name='Volume', marker_color='#6b7280'))
-    fig_volume.update_layout(
-        height=150,
-        margin=dict(l=20, r=20, t=0, b=20),
-        template="plotly_dark",
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font=dict(color="#facc15")
-    )
+    fig_volume = {
+        'data': [{'type': 'bar', 'x': dates.tolist(), 'y': volume, 'name': 'Volume', 'marker': {'color': '#6b7280'}}],
+        'layout': _chart_layout(150, {'l': 20, 'r': 20, 't': 0, 'b': 20}),
+    }
     
     # Chart RSI
-    fig_rsi = go.Figure()
-    fig_rsi.add_trace(go.Scatter(x=df.index, y=df['RSI'], name='RSI', line=dict(color='#a855f7', width=1)))
-    fig_rsi.add_hline(y=70, line_dash="dash", line_color="#ef4444")
-    fig_rsi.add_hline(y=30, line_dash="dash", line_color="#10b981")
-    fig_rsi.update_layout(
-        title='RSI (Relative Strength Index)',
-        height=150,
-        margin=dict(l=20, r=20, t=40, b=20),
-        template="plotly_dark",
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font=dict(color="#facc15")
-    )
+    fig_rsi = {
+        'data': [{'type': 'scatter', 'x': rsi_x.tolist(), 'y': rsi, 'name': 'RSI', 'line': {'color': '#a855f7', 'width': 1}}],
+        'layout': {
+            **_chart_layout(150, {'l': 20, 'r': 20, 't': 40, 'b': 20}, title='RSI (Relative Strength Index)'),
+            'shapes': [_hline(70, '#ef4444'), _hline(30, '#10b981')],
+            # Sumbu X tetap sejajar dengan chart harga walau prefix NaN RSI dibuang
+            'xaxis': {'range': [dates[0], dates[-1]]} if len(dates) else {},
+        },
+    }
 
     return {
-        'price': json.dumps(fig, cls=PlotlyJSONEncoder),
-        'volume': json.dumps(fig_volume, cls=PlotlyJSONEncoder),
-        'rsi': json.dumps(fig_rsi, cls=PlotlyJSONEncoder)
+        'price': fig,
+        'volume': fig_volume,
+        'rsi': fig_rsi,
     }
 
 # --- FLASK APP Setup & HTML Template ---
@@ -290,6 +583,11 @@ HTML_TEMPLATE = """
                             <input type="number" name="min_volume_shares" value="{{ criteria_params.min_volume_shares }}" step="100000" required
                                    class="w-full p-2 rounded bg-gray-700 border border-gray-600 text-white focus:ring-[#facc15] focus:border-[#facc15]">
                             <p class="text-xs text-red-400">Perhatian: Menggunakan Volume SHARES. Contoh: **5000000** (5 juta saham).</p>
+
+                            <label class="block text-gray-400 mt-4 mb-1">Maks. Saham Ditampilkan (Top K)</label>
+                            <input type="number" name="top_k" value="{{ criteria_params.top_k }}" step="1" min="1" required
+                                   class="w-full p-2 rounded bg-gray-700 border border-gray-600 text-white focus:ring-[#facc15] focus:border-[#facc15]">
+                            <p class="text-xs text-gray-500">Contoh: **25** (hanya 25 saham dengan Gain 30D tertinggi)</p>
                         </div>
 
                         <!-- Kolom 4: Parameter Indikator Lanjutan (untuk Chart) -->
@@ -313,7 +611,7 @@ HTML_TEMPLATE = """
         <!-- Area Hasil Analisis -->
         {% if results %}
         <div class="card mb-8">
-            <h2 class="text-2xl font-bold mb-4 text-[#facc15]">Hasil Screening ({{ results | length }} Saham Lolos)</h2>
+            <h2 class="text-2xl font-bold mb-4 text-[#facc15]">Hasil Screening ({{ passed_count }} Saham Lolos{% if results | length < passed_count %}, menampilkan {{ results | length }} dari {{ passed_count }}{% endif %})</h2>
 
             <!-- IHSG Status -->
             <div class="mb-6 p-4 rounded-lg border-l-4 
@@ -372,21 +670,37 @@ HTML_TEMPLATE = """
         </div>
 
         <script>
-            const chartData = {{ chart_jsons | safe }};
+            // Chart diambil per ticker saat dipilih (lazy), lalu disimpan agar tidak diminta ulang
+            const chartQuery = {{ chart_query | tojson }};
+            const chartCache = {};
             const defaultTicker = document.getElementById('chart-selector').value;
 
+            function renderChart(data) {
+                Plotly.react('plotly-chart-price', data.price.data, data.price.layout, {responsive: true});
+                Plotly.react('plotly-chart-volume', data.volume.data, data.volume.layout, {responsive: true});
+                Plotly.react('plotly-chart-rsi', data.rsi.data, data.rsi.layout, {responsive: true});
+            }
+
             function updateChart() {
                 const selectedTicker = document.getElementById('chart-selector').value;
-                const data = chartData[selectedTicker];
-                if (data) {
-                    Plotly.react('plotly-chart-price', JSON.parse(data.price).data, JSON.parse(data.price).layout, {responsive: true});
-                    Plotly.react('plotly-chart-volume', JSON.parse(data.volume).data, JSON.parse(data.volume).layout, {responsive: true});
-                    Plotly.react('plotly-chart-rsi', JSON.parse(data.rsi).data, JSON.parse(data.rsi).layout, {responsive: true});
+                if (chartCache[selectedTicker]) {
+                    renderChart(chartCache[selectedTicker]);
+                    return;
                 }
+                fetch('/chart/' + encodeURIComponent(selectedTicker) + '?' + chartQuery)
+                    .then(response => response.ok ? response.json() : Promise.reject(response.status))
+                    .then(data => {
+                        chartCache[selectedTicker] = data;
+                        // Abaikan respons lama jika user sudah memilih ticker lain
+                        if (document.getElementById('chart-selector').value === selectedTicker) {
+                            renderChart(data);
+                        }
+                    })
+                    .catch(err => console.error(`Gagal memuat chart ${selectedTicker}:`, err));
             }
             
             // Render chart saat pertama kali dimuat
-            if (chartData[defaultTicker]) {
+            if (defaultTicker) {
                 updateChart();
             }
         </script>
@@ -401,170 +715,167 @@ HTML_TEMPLATE = """
 </html>
 """
 
+# Template dikompilasi sekali saat import; render_template menerima objek Template secara langsung
+# sehingga tidak ada parsing/kompilasi ulang per request seperti pada render_template_string
+COMPILED_TEMPLATE = app.jinja_env.from_string(HTML_TEMPLATE)
+
 # --- Flask Routes ---
 
 @app.route('/', methods=['GET'])
 def index():
     """Halaman utama dengan form default."""
-    # Default parameters for a strong gap-up filter
-    default_criteria = {
-        'open_ratio': 1.015,         # Open > 1.015 * Prev Close
-        'min_price': 50,             # Price > 50
-        'min_volume_shares': 5000000, # Volume > 5,000,000 shares
+    return _render_form(DEFAULT_FORM_PARAMS)
+
+
+class FormParams(NamedTuple):
+    """Parameter form screening yang sudah diparse dan dikonversi tipenya."""
+    criteria: dict
+    indicators: dict
+    tickers: list
+    period: str
+    invalid_fields: tuple = ()  # Field angka yang gagal diparse (diganti nilai default)
+
+
+def _parse_form(form):
+    """Parse & validasi input form sekali; dipakai bersama oleh jalur sukses maupun render error.
+
+    Field angka yang tidak valid tidak membatalkan parsing field lain: nilainya diganti default
+    dan namanya dicatat di `invalid_fields`, sehingga form tetap menampilkan input user.
+    """
+    invalid_fields = []
+
+    def number(name, cast, default):
+        try:
+            return cast(form.get(name, default))
+        except (TypeError, ValueError):
+            invalid_fields.append(name)
+            return default
+
+    # Ambil dan bersihkan daftar ticker dari textarea
+    tickers_str = form.get('tickers_list', "").replace(',', ' ').replace('\n', ' ').replace('\r', ' ')
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers_str.split() if t.strip()))
+
+    # Parameter Kriteria Filter (Diambil langsung dari input form)
+    criteria = {
+        'open_ratio': number('open_ratio', float, DEFAULT_CRITERIA['open_ratio']),
+        'min_price': number('min_price', int, DEFAULT_CRITERIA['min_price']),
+        'min_volume_shares': number('min_volume_shares', int, DEFAULT_CRITERIA['min_volume_shares']),
+        'top_k': max(1, number('top_k', int, DEFAULT_CRITERIA['top_k'])),
     }
 
-    # Parameters for Chart Indicators (default)
-    default_indicators = {
-        'sma_short': 20, 'sma_long': 60, 'rsi_period': 14, 'vol_period': 20, 'hist_days': 30
+    # Parameter Indikator Chart
+    indicators = {
+        'sma_short': number('sma_short', int, DEFAULT_INDICATORS['sma_short']),
+        'sma_long': number('sma_long', int, DEFAULT_INDICATORS['sma_long']),
+        'rsi_period': number('rsi_period', int, DEFAULT_INDICATORS['rsi_period']),
+        'vol_period': DEFAULT_INDICATORS['vol_period'], # Fixed at 20 for Vol Avg
+        'hist_days': DEFAULT_INDICATORS['hist_days'],   # Fixed at 30 for sorting
     }
-    
-    indicator_inputs = [
-        ("SMA Pendek (Hari)", "sma_short", default_indicators['sma_short']),
-        ("SMA Panjang (Hari)", "sma_long", default_indicators['sma_long']),
-        ("RSI Periode", "rsi_period", default_indicators['rsi_period']),
-    ]
-    
-    # Concatenate default list to string for textarea
-    input_tickers_str = ", ".join(DEFAULT_IDX_TICKERS)
 
-    return render_template_string(
-        HTML_TEMPLATE,
-        input_tickers_str=input_tickers_str,
+    return FormParams(criteria, indicators, tickers, form.get('period', '6mo'), tuple(invalid_fields))
+
+
+# Dipakai saat request form tidak bisa dibaca sama sekali
+DEFAULT_FORM_PARAMS = FormParams(DEFAULT_CRITERIA, DEFAULT_INDICATORS, [], '6mo')
+
+
+def _render_form(params, **context):
+    """Render halaman dengan nilai form dari `params`; `context` berisi hasil atau error_message."""
+    if params is DEFAULT_FORM_PARAMS:
+        indicator_inputs = DEFAULT_INDICATOR_INPUTS
+    else:
+        indicator_inputs = [(label, name, params.indicators[name]) for label, name in INDICATOR_INPUT_FIELDS]
+    context.setdefault('results', None)
+    context.setdefault('error_message', None)
+
+    return render_template(
+        COMPILED_TEMPLATE,
+        input_tickers_str=", ".join(params.tickers) if params.tickers else DEFAULT_TICKERS_STR,
         ihsg_ticker=IHSG_TICKER,
-        criteria_params=default_criteria,
+        criteria_params=params.criteria,
         indicator_inputs=indicator_inputs,
-        period='6mo',
-        results=None,
-        error_message=None
+        period=params.period,
+        **context
     )
 
 
 @app.route('/analyze', methods=['POST'])
 def analyze():
     """Route untuk menjalankan screening berdasarkan input form."""
-    selected_tickers_list = []
-    period = '6mo'
+    params = None
     try:
-        form_data = request.form
-        
         # --- 1. Ambil Parameter dari Form ---
-        
-        # Ambil dan bersihkan daftar ticker dari textarea
-        tickers_str = form_data.get('tickers_list', "").replace(',', ' ').replace('\n', ' ').replace('\r', ' ')
-        selected_tickers_list = [t.strip().upper() for t in tickers_str.split() if t.strip()]
-        period = form_data.get('period', '6mo')
-
-        # Parameter Kriteria Filter (Diambil langsung dari input form)
-        criteria_params = {
-            'open_ratio': float(form_data.get('open_ratio', 1.015)),
-            'min_price': int(form_data.get('min_price', 50)),
-            'min_volume_shares': int(form_data.get('min_volume_shares', 5000000)),
-        }
-        
-        # Parameter Indikator Chart
-        indicator_params = {
-            'sma_short': int(form_data.get('sma_short', 20)),
-            'sma_long': int(form_data.get('sma_long', 60)),
-            'rsi_period': int(form_data.get('rsi_period', 14)),
-            'vol_period': 20, # Fixed at 20 for Vol Avg
-            'hist_days': 30,  # Fixed at 30 for sorting
-        }
-
-        if not selected_tickers_list:
-            raise ValueError("Harap masukkan minimal satu ticker saham (contoh: BBCA.JK) untuk di-screen.")
+        params = _parse_form(request.form)
+
+        if params.invalid_fields:
+            raise ValueError(f"Input angka tidak valid: {', '.join(params.invalid_fields)}. Nilai default dipakai untuk field tersebut.")
 
-        all_data_tickers = list(set(selected_tickers_list + [IHSG_TICKER]))
+        if not params.tickers:
+            raise ValueError("Harap masukkan minimal satu ticker saham (contoh: BBCA.JK) untuk di-screen.")
         
         # --- 2. Ambil Data ---
-        full_data, ihsg_data = load_historical_data(all_data_tickers, period=period)
+        ohlcv, ihsg_data = load_historical_data(params.tickers, period=params.period)
+        ihsg_status, ihsg_change = ihsg_summary(ihsg_data)
         
         # --- 3. Running Screener ---
         
-        # Passing: full_data (MultiIndex DF), ihsg_data (Single Index DF), criteria_params, indicator_params
-        results, chart_jsons, ihsg_status, ihsg_change = screen_and_extract(
-            full_data, ihsg_data, criteria_params, indicator_params
+        # Passing: ohlcv (array per field), criteria & indicator params (sebagai tuple untuk lru_cache)
+        results, passed_count = (
+            screen(ohlcv, params.period, _as_key(params.criteria), _as_key(params.indicators)) if ohlcv is not None else ([], 0)
         )
 
         if not results:
              raise ValueError("Tidak ada saham yang lolos kriteria screening yang Anda tentukan.")
-             
-        results_df = pd.DataFrame(results)
-        
-        # Terapkan Sorting: Diurutkan berdasarkan Gain 30D (%) secara DESCENDING
-        results_df['Gain 30D (%)'] = pd.to_numeric(results_df['Gain 30D (%)'], errors='coerce')
-        results_df = results_df.sort_values(by=['Gain 30D (%)'], ascending=False).dropna(subset=['Gain 30D (%)'])
-        
-        # Konversi DataFrame ke list of dicts untuk render_template_string
-        final_results = results_df.to_dict('records')
         
         # --- 4. Render Hasil ---
-        indicator_inputs = [
-            ("SMA Pendek (Hari)", "sma_short", indicator_params['sma_short']),
-            ("SMA Panjang (Hari)", "sma_long", indicator_params['sma_long']),
-            ("RSI Periode", "rsi_period", indicator_params['rsi_period']),
-        ]
-        
-        return render_template_string(
-            HTML_TEMPLATE,
-            input_tickers_str=", ".join(selected_tickers_list),
-            ihsg_ticker=IHSG_TICKER,
-            criteria_params=criteria_params,
-            indicator_inputs=indicator_inputs,
-            period=period,
-            results=final_results,
-            chart_jsons=chart_jsons,
+        # Hasil sudah diurutkan berdasarkan Gain 30D (%) dan dibatasi Top-K di screen
+        return _render_form(
+            params,
+            results=results,
+            passed_count=passed_count,
+            chart_query=urlencode({'period': params.period, **params.indicators}),
             ihsg_status=ihsg_status,
             ihsg_change=ihsg_change,
-            error_message=None
         )
 
     except ValueError as e:
-        # Re-render form dengan error message
-        # Pastikan kita menggunakan nilai yang dikirimkan user jika ada
-        default_criteria = {
-            'open_ratio': float(form_data.get('open_ratio', 1.015)) if 'form_data' in locals() else 1.015,
-            'min_price': int(form_data.get('min_price', 50)) if 'form_data' in locals() else 50,
-            'min_volume_shares': int(form_data.get('min_volume_shares', 5000000)) if 'form_data' in locals() else 5000000,
-        }
-        default_indicators = {'sma_short': 20, 'sma_long': 60, 'rsi_period': 14}
-        
-        indicator_inputs = [
-            ("SMA Pendek (Hari)", "sma_short", default_indicators['sma_short']),
-            ("SMA Panjang (Hari)", "sma_long", default_indicators['sma_long']),
-            ("RSI Periode", "rsi_period", default_indicators['rsi_period']),
-        ]
-        
-        return render_template_string(HTML_TEMPLATE, 
-                                      input_tickers_str=", ".join(selected_tickers_list) if selected_tickers_list else ", ".join(DEFAULT_IDX_TICKERS),
-                                      ihsg_ticker=IHSG_TICKER,
-                                      criteria_params=default_criteria,
-                                      indicator_inputs=indicator_inputs,
-                                      period=period,
-                                      results=None,
-                                      error_message=str(e))
+        # Re-render form dengan error message, memakai nilai yang dikirimkan user jika berhasil diparse
+        return _render_form(params or DEFAULT_FORM_PARAMS, error_message=str(e))
     except Exception as e:
         # Re-render form dengan error message umum
-        default_criteria = {
-            'open_ratio': float(form_data.get('open_ratio', 1.015)) if 'form_data' in locals() else 1.015,
-            'min_price': int(form_data.get('min_price', 50)) if 'form_data' in locals() else 50,
-            'min_volume_shares': int(form_data.get('min_volume_shares', 5000000)) if 'form_data' in locals() else 5000000,
-        }
-        default_indicators = {'sma_short': 20, 'sma_long': 60, 'rsi_period': 14}
-        
-        indicator_inputs = [
-            ("SMA Pendek (Hari)", "sma_short", default_indicators['sma_short']),
-            ("SMA Panjang (Hari)", "sma_long", default_indicators['sma_long']),
-            ("RSI Periode", "rsi_period", default_indicators['rsi_period']),
-        ]
-        
-        return render_template_string(HTML_TEMPLATE, 
-                                      input_tickers_str=", ".join(selected_tickers_list) if selected_tickers_list else ", ".join(DEFAULT_IDX_TICKERS),
-                                      ihsg_ticker=IHSG_TICKER,
-                                      criteria_params=default_criteria,
-                                      indicator_inputs=indicator_inputs,
-                                      period=period,
-                                      results=None,
-                                      error_message=f"Terjadi kesalahan tak terduga saat memproses data: {e}. Cek kembali koneksi internet dan daftar ticker.")
+        return _render_form(
+            params or DEFAULT_FORM_PARAMS,
+            error_message=f"Terjadi kesalahan tak terduga saat memproses data: {e}. Cek kembali koneksi internet dan daftar ticker.",
+        )
+
+
+@app.route('/chart/<ticker>', methods=['GET'])
+def chart(ticker):
+    """Route JSON untuk chart satu ticker, diambil oleh browser saat ticker dipilih."""
+    period = request.args.get('period', '6mo')
+    indicator_params = {
+        'sma_short': request.args.get('sma_short', DEFAULT_INDICATORS['sma_short'], type=int),
+        'sma_long': request.args.get('sma_long', DEFAULT_INDICATORS['sma_long'], type=int),
+        'rsi_period': request.args.get('rsi_period', DEFAULT_INDICATORS['rsi_period'], type=int),
+        'vol_period': request.args.get('vol_period', DEFAULT_INDICATORS['vol_period'], type=int),
+        'hist_days': request.args.get('hist_days', DEFAULT_INDICATORS['hist_days'], type=int),
+    }
+
+    try:
+        ohlcv = load_ticker_data(ticker, period=period)
+        indicators = calculate_indicators(ohlcv, **indicator_params)
+
+        # Kolom 0 = ticker ini; semua seri diteruskan sebagai view array tanpa DataFrame perantara
+        charts = create_plotly_json(
+            ohlcv.index,
+            (ohlcv.open[:, 0], ohlcv.high[:, 0], ohlcv.low[:, 0], ohlcv.close[:, 0]),
+            indicators['SMA_Short'][:, 0], indicators['SMA_Long'][:, 0], indicators['RSI'][:, 0],
+            ohlcv.volume[:, 0], ticker, indicator_params,
+        )
+        return Response(_dumps(charts), mimetype='application/json')
+    except Exception as e:
+        print(f"Error building chart for {ticker}: {e}")
+        return jsonify({'error': f"Chart untuk {ticker} tidak tersedia."}), 404
 
 
 if __name__ == '__main__':